@@ -6,72 +6,183 @@ Usage:
 """
 
 import argparse
-import csv
-import json
-import re
+import math
 import sys
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, TextIO
+from typing import Dict, Iterable, List, TextIO
 
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pc
 
-_INT_PATTERN = re.compile(r"^[+-]?\d+$")
-_FLOAT_PATTERN = re.compile(r"^[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?$")
+
+def _json_dumps(value) -> str:
+    return orjson.dumps(value).decode("utf-8")
+
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
 
 
 def _coerce_number(value: str):
     text = value.strip()
-    if text == "":
+    if not text:
         return None
-    if _INT_PATTERN.match(text):
-        try:
-            return int(text)
-        except ValueError:
-            return text
-    if _FLOAT_PATTERN.match(text):
-        try:
-            return float(text)
-        except ValueError:
-            return text
-    return text
+    # int()/float() validate their input, but also accept digit-group underscores
+    # ("1_000") and float("nan"/"inf"/"Infinity"); those are kept as text, as are
+    # integers too wide for int64, which orjson and Arrow can't represent.
+    if "_" in text:
+        return text
+    try:
+        number = int(text)
+    except ValueError:
+        pass
+    else:
+        return number if INT64_MIN <= number <= INT64_MAX else text
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return number if math.isfinite(number) else text
 
 
-def parse_payload_block(block: str) -> Iterable[Dict]:
+def _split_payload_lines(block: str) -> Iterable[tuple]:
+    """Yield (packet, type_tag, payload) for each EmotiBit line in a payload cell."""
     for raw_line in block.splitlines():
         line = raw_line.strip()
         if not line:
             continue
-        parts = [p.strip() for p in line.split(",")]
+        parts = line.split(",")
+        # Devices write no padding around commas, so only strip fields when the
+        # line has whitespace left in it. Every whitespace character str.strip()
+        # removes is either a space or non-printable, so this check covers them all.
+        if " " in line or not line.isprintable():
+            parts = [p.strip() for p in parts]
         if len(parts) < 7:
             raise ValueError(
                 f"Payload line has {len(parts)} columns (<7 expected): {raw_line!r}"
             )
+        packet = _coerce_number(parts[1])
+        type_tag = parts[3]
+        # Keep payload entries as strings to avoid mixed numeric/string types.
+        payload = [v for v in parts[6:] if v]
+        yield packet, type_tag, payload
+
+
+def parse_payload_block(block: str) -> Iterable[Dict]:
+    for packet, type_tag, payload in _split_payload_lines(block):
         yield {
-            "packet": _coerce_number(parts[1]),
-            "type_tag": parts[3],  # Kept for grouping, excluded from CSV output
-            # Keep payload entries as strings to avoid mixed numeric/string types.
-            "payload": [v.strip() for v in parts[6:] if v.strip() != ""],
+            "packet": packet,
+            "type_tag": type_tag,  # Kept for grouping, excluded from CSV output
+            "payload": payload,
         }
 
 
-def parse_file(path: Path) -> Iterable[Dict]:
-    with path.open(newline="") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row_number, row in enumerate(reader, start=2):  # account for header line
-            payload_blob: Optional[str] = row.get("payload")
-            if payload_blob is None:
-                continue
-            for payload_row in parse_payload_block(payload_blob):
-                yield {
-                    "timestamp_iso8601": row.get("timestamp_iso8601"),
-                    "timestamp_epoch_ms": _coerce_number(
-                        row.get("timestamp_epoch_ms", "")
-                    ),
-                    **payload_row,
-                }
+INPUT_COLUMNS = ["timestamp_iso8601", "timestamp_epoch_ms", "payload"]
+
+# Arrow reads the input in blocks of this many bytes, tokenizing each block in C++.
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def _skip_invalid_row(row) -> str:
+    """
+    Arrow invalid_row_handler: skip rows whose column count doesn't match the header.
+
+    Short rows have no payload, so they're skipped silently. Arrow can't
+    read rows with extra columns either, so those are skipped with a warning.
+    """
+    if row.actual_columns > row.expected_columns:
+        print(
+            f"Warning: skipping row with {row.actual_columns} columns "
+            f"({row.expected_columns} expected): {row.text[:80]!r}",
+            file=sys.stderr,
+        )
+    return "skip"
+
+
+def _read_input_rows(
+    source, block_size: int = READ_BLOCK_SIZE, use_threads: bool = True
+) -> Iterable[tuple]:
+    """
+    Yield (timestamp_iso8601, timestamp_epoch_ms, payload) text for each input row.
+
+    source is either a file path or the file's contents as bytes. Rows with
+    fewer columns than the header are skipped. Unlike csv.DictReader, Arrow
+    can't ignore extra trailing fields, so rows with more columns than the
+    header are skipped too, with a warning on stderr.
+
+    use_threads lets Arrow parse blocks on its CPU thread pool; callers that
+    already run one parse per core should pass False.
+    """
+    # Memory-map files (or wrap bytes) so Arrow tokenizes the raw bytes in place. A
+    # line-based reader can't be used here: quoted payload cells span several lines.
+    # Arrow rejects an empty file (it has no header), so that yields no rows instead.
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        if len(source) == 0:
+            return
+        stream = pa.BufferReader(source)
+    else:
+        if Path(source).stat().st_size == 0:
+            return
+        stream = pa.memory_map(str(source))
+    with stream:
+        reader = pc.open_csv(
+            stream,
+            read_options=pc.ReadOptions(block_size=block_size, use_threads=use_threads),
+            # Payload cells hold several newline-separated EmotiBit lines.
+            parse_options=pc.ParseOptions(
+                newlines_in_values=True, invalid_row_handler=_skip_invalid_row
+            ),
+            # Read everything as text so values are coerced exactly as before.
+            convert_options=pc.ConvertOptions(
+                include_columns=INPUT_COLUMNS,
+                include_missing_columns=True,
+                column_types={name: pa.string() for name in INPUT_COLUMNS},
+            ),
+        )
+        with reader:
+            for batch in reader:
+                yield from zip(
+                    batch.column("timestamp_iso8601").to_pylist(),
+                    batch.column("timestamp_epoch_ms").to_pylist(),
+                    batch.column("payload").to_pylist(),
+                )
+
+
+# Field order of the plain-tuple records yielded by parse_bytes_tuples
+RECORD_FIELDS = ("timestamp_iso8601", "timestamp_epoch_ms", "packet", "type_tag", "payload")
+
+
+def _parse_row_tuples(rows: Iterable[tuple]) -> Iterable[tuple]:
+    for timestamp_iso8601, timestamp_epoch_ms, payload_blob in rows:
+        if payload_blob is None:
+            continue
+        # Every payload line in a row shares the row's timestamp, so coerce it once
+        timestamp_epoch_ms = _coerce_number(timestamp_epoch_ms or "")
+        for packet, type_tag, payload in _split_payload_lines(payload_blob):
+            yield timestamp_iso8601, timestamp_epoch_ms, packet, type_tag, payload
+
+
+def parse_file(path: Path, block_size: int = READ_BLOCK_SIZE) -> Iterable[Dict]:
+    for record in _parse_row_tuples(_read_input_rows(path, block_size)):
+        yield dict(zip(RECORD_FIELDS, record))
+
+
+def parse_bytes_tuples(
+    data: bytes, block_size: int = READ_BLOCK_SIZE, use_threads: bool = True
+) -> Iterable[tuple]:
+    """
+    Parse CSV content already held in memory, e.g. a downloaded blob.
+
+    Each record is a plain tuple in RECORD_FIELDS order rather than a dict.
+    Tuples are cheaper to build and less than half the size, which matters
+    when records are buffered in bulk.
+    """
+    return _parse_row_tuples(_read_input_rows(data, block_size, use_threads))
 
 
 def serialize_payload(values: List) -> str:
-    return json.dumps([str(v) for v in values], ensure_ascii=True, separators=(",", ":"))
+    return _json_dumps([str(v) for v in values])
 
 
 FIELDNAMES = [
@@ -82,18 +193,49 @@ FIELDNAMES = [
 ]
 
 
+# Output files are opened with a 1 MiB buffer, and JSONL lines are joined in
+# batches so each write() call moves a sizeable chunk of text.
+OUTPUT_BUFFER_SIZE = 1 << 20
+JSONL_BATCH_SIZE = 1024
+
+
 def write_jsonl(records: Iterable[Dict], stream: TextIO) -> None:
+    batch = []
     for record in records:
-        stream.write(json.dumps(record, ensure_ascii=True) + "\n")
+        batch.append(_json_dumps(record))
+        if len(batch) >= JSONL_BATCH_SIZE:
+            stream.write("\n".join(batch) + "\n")
+            batch.clear()
+    if batch:
+        stream.write("\n".join(batch) + "\n")
+
+
+def _csv_field(value) -> str:
+    """Format a value the way csv.writer does with its default (minimal) quoting."""
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        return str(value)
+    if "," in value or '"' in value or "\n" in value or "\r" in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
 
 
 def write_csv(records: Iterable[Dict], stream: TextIO) -> None:
-    writer = csv.DictWriter(stream, fieldnames=FIELDNAMES, extrasaction="ignore")
-    writer.writeheader()
+    # The schema is fixed, so rows are formatted directly rather than through
+    # csv.DictWriter. Output matches the csv module's excel dialect byte for byte.
+    write = stream.write
+    write(",".join(FIELDNAMES) + "\r\n")
     for record in records:
-        row = dict(record)
-        row["payload"] = serialize_payload(row.get("payload") or [])
-        writer.writerow(row)
+        # parse_file keeps payload entries as strings, so they are encoded as-is
+        # rather than going through serialize_payload's str() pass.
+        payload = _json_dumps(record.get("payload") or [])
+        write(
+            f"{_csv_field(record.get('timestamp_iso8601'))},"
+            f"{_csv_field(record.get('timestamp_epoch_ms'))},"
+            f"{_csv_field(record.get('packet'))},"
+            f"{_csv_field(payload)}\r\n"
+        )
 
 
 def main() -> None:
@@ -128,7 +270,10 @@ def main() -> None:
     if args.output:
         args.output.parent.mkdir(parents=True, exist_ok=True)
         output_stream = args.output.open(
-            "w", encoding="utf-8", newline="" if args.format == "csv" else None
+            "w",
+            buffering=OUTPUT_BUFFER_SIZE,
+            encoding="utf-8",
+            newline="" if args.format == "csv" else None,
         )
         needs_close = True
     else:
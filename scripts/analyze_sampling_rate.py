@@ -11,70 +11,40 @@ Calculates sampling rate based on timestamp differences between consecutive reco
 
 import argparse
 import csv
+import os
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from statistics import mean, median, stdev
 
-
-def parse_timestamp(ts_str: str) -> float:
-    """Parse timestamp_epoch_ms to float."""
-    try:
-        return float(ts_str)
-    except (ValueError, TypeError):
-        return None
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pc
 
 
-def analyze_file(file_path: Path) -> dict:
+def summarize_intervals(intervals: np.ndarray) -> dict:
     """
-    Analyze a single CSV file and return sampling statistics.
+    Compute interval statistics for an array of positive intervals.
 
     Returns:
-        dict with count, mean_interval_ms, median_interval_ms, estimated_hz
+        dict with mean_interval_ms, median_interval_ms, stdev_interval_ms, estimated_hz
     """
-    timestamps = []
-
-    with file_path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            ts = parse_timestamp(row.get("timestamp_epoch_ms", ""))
-            if ts is not None:
-                timestamps.append(ts)
-
-    if len(timestamps) < 2:
-        return {
-            "count": len(timestamps),
-            "mean_interval_ms": None,
-            "median_interval_ms": None,
-            "stdev_interval_ms": None,
-            "estimated_hz": None,
-        }
-
-    # Sort timestamps and calculate intervals
-    timestamps.sort()
-    intervals = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps) - 1)]
-
-    # Filter out negative or zero intervals (shouldn't happen but just in case)
-    intervals = [i for i in intervals if i > 0]
-
-    if not intervals:
+    if len(intervals) == 0:
         return {
-            "count": len(timestamps),
             "mean_interval_ms": None,
             "median_interval_ms": None,
             "stdev_interval_ms": None,
             "estimated_hz": None,
         }
 
-    mean_interval = mean(intervals)
-    median_interval = median(intervals)
-    stdev_interval = stdev(intervals) if len(intervals) > 1 else 0
+    mean_interval = float(intervals.mean())
+    median_interval = float(np.median(intervals))
+    stdev_interval = float(intervals.std(ddof=1)) if len(intervals) > 1 else 0
 
     # Estimate Hz from mean interval
     estimated_hz = 1000.0 / mean_interval if mean_interval > 0 else None
 
     return {
-        "count": len(timestamps),
         "mean_interval_ms": mean_interval,
         "median_interval_ms": median_interval,
         "stdev_interval_ms": stdev_interval,
@@ -82,6 +52,88 @@ def analyze_file(file_path: Path) -> dict:
     }
 
 
+def _read_timestamp_column(file_path: Path, invalid_rows: list):
+    # Only the timestamp column is needed; files without it yield no timestamps.
+    # Rows with the wrong number of columns are skipped and collected in invalid_rows.
+    def skip_row(row):
+        invalid_rows.append(row.number)
+        return "skip"
+
+    table = pc.read_csv(
+        file_path,
+        # Files are analyzed one per worker process, so don't thread within a file
+        read_options=pc.ReadOptions(use_threads=False),
+        parse_options=pc.ParseOptions(invalid_row_handler=skip_row),
+        convert_options=pc.ConvertOptions(
+            include_columns=["timestamp_epoch_ms"],
+            include_missing_columns=True,
+            column_types={"timestamp_epoch_ms": pa.float64()},
+        ),
+    )
+    return table.column(0)
+
+
+def parse_timestamp(ts_str: str) -> float:
+    """Parse timestamp_epoch_ms to float, or NaN if it isn't numeric."""
+    try:
+        return float(ts_str)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _read_timestamps_by_row(file_path: Path) -> np.ndarray:
+    """Read timestamps with csv.DictReader, which tolerates ragged rows."""
+    with file_path.open(newline="") as csvfile:
+        return np.array(
+            [parse_timestamp(row.get("timestamp_epoch_ms")) for row in csv.DictReader(csvfile)],
+            dtype=np.float64,
+        )
+
+
+def read_timestamps(file_path: Path) -> np.ndarray:
+    """
+    Read a file's timestamp_epoch_ms column as float64, with NaN for missing or
+    non-numeric cells.
+    """
+    # Arrow rejects an empty file (it has no header)
+    if file_path.stat().st_size == 0:
+        return np.empty(0, dtype=np.float64)
+    invalid_rows = []
+    try:
+        column = _read_timestamp_column(file_path, invalid_rows)
+    except pa.ArrowInvalid:
+        # Some cell isn't numeric (the parser passes such epochs through as text)
+        return _read_timestamps_by_row(file_path)
+    if invalid_rows:
+        # Ragged rows (e.g. in location files, which are copied verbatim) can
+        # still hold a timestamp; read them row by row rather than dropping them
+        return _read_timestamps_by_row(file_path)
+    return column.to_numpy(zero_copy_only=False)
+
+
+def analyze_file(file_path: Path) -> tuple:
+    """
+    Analyze a single CSV file and return sampling statistics.
+
+    Returns:
+        tuple: (stats, intervals) - stats is a dict with count, mean_interval_ms,
+        median_interval_ms, stdev_interval_ms, estimated_hz; intervals is the array
+        of positive intervals between consecutive sorted timestamps
+    """
+    timestamps = read_timestamps(file_path)
+    timestamps = timestamps[~np.isnan(timestamps)]
+
+    # Sort timestamps and calculate intervals
+    timestamps.sort()
+    intervals = np.diff(timestamps)
+
+    # Filter out negative or zero intervals (shouldn't happen but just in case)
+    intervals = intervals[intervals > 0]
+
+    stats = {"count": len(timestamps), **summarize_intervals(intervals)}
+    return stats, intervals
+
+
 def find_parsed_files(input_dir: Path, uid_filter: str = None) -> dict:
     """
     Find all parsed CSV files grouped by type_tag.
@@ -144,53 +196,40 @@ def main() -> int:
 
     print(f"Found {sum(len(f) for f in files_by_type.values())} files across {len(files_by_type)} data types.\n")
 
-    # Analyze each type
-    results = {}
-    for type_tag in sorted(files_by_type.keys()):
-        files = files_by_type[type_tag]
-
-        # Aggregate stats across all files for this type
-        all_intervals = []
-        total_count = 0
-
-        for file_path in files:
-            stats = analyze_file(file_path)
-            total_count += stats["count"]
-
-            # Re-read to get all intervals for aggregate stats
-            timestamps = []
-            with file_path.open(newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    ts = parse_timestamp(row.get("timestamp_epoch_ms", ""))
-                    if ts is not None:
-                        timestamps.append(ts)
-
-            if len(timestamps) >= 2:
-                timestamps.sort()
-                intervals = [timestamps[i+1] - timestamps[i] for i in range(len(timestamps) - 1)]
-                all_intervals.extend([i for i in intervals if i > 0])
-
-        if all_intervals:
-            mean_interval = mean(all_intervals)
-            median_interval = median(all_intervals)
-            stdev_interval = stdev(all_intervals) if len(all_intervals) > 1 else 0
-            estimated_hz = 1000.0 / mean_interval if mean_interval > 0 else None
-        else:
-            mean_interval = None
-            median_interval = None
-            stdev_interval = None
-            estimated_hz = None
-
-        results[type_tag] = {
-            "files": len(files),
-            "total_samples": total_count,
-            "mean_interval_ms": mean_interval,
-            "median_interval_ms": median_interval,
-            "stdev_interval_ms": stdev_interval,
-            "estimated_hz": estimated_hz,
+    # Files are independent, so analyze them all in parallel worker processes, one
+    # per CPU this process may run on (fewer than os.cpu_count() under an affinity mask)
+    workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        analyses = {
+            file_path: executor.submit(analyze_file, file_path)
+            for files in files_by_type.values()
+            for file_path in files
         }
 
+        # Analyze each type
+        results = {}
+        for type_tag in sorted(files_by_type.keys()):
+            files = files_by_type[type_tag]
+
+            # Aggregate stats across all files for this type
+            all_intervals = []
+            total_count = 0
+
+            for file_path in files:
+                stats, intervals = analyses[file_path].result()
+                total_count += stats["count"]
+                all_intervals.append(intervals)
+
+            aggregate = summarize_intervals(
+                np.concatenate(all_intervals) if all_intervals else np.empty(0)
+            )
+
+            results[type_tag] = {
+                "files": len(files),
+                "total_samples": total_count,
+                **aggregate,
+            }
+
     # Print results
     print("=" * 80)
     print(f"{'Type Tag':<15} {'Files':<8} {'Samples':<12} {'Mean (ms)':<12} {'Median (ms)':<12} {'StdDev (ms)':<12} {'Est. Hz':<10}")
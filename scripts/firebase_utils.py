@@ -0,0 +1,58 @@
+"""
+Firebase Storage setup shared by the scripts in this directory.
+
+Environment variables required:
+  FIREBASE_CREDENTIALS: JSON string of Firebase service account credentials
+  FIREBASE_BUCKET: Firebase Storage bucket name (e.g., "my-project.appspot.com")
+"""
+
+import json
+import os
+
+import firebase_admin
+from firebase_admin import credentials, storage
+from requests.adapters import HTTPAdapter
+
+
+# Blob (under the parsed/ output prefix) recording which input files have been
+# processed; it is not a parsed output itself
+MANIFEST_NAME = ".manifest.json"
+
+
+def _get_app() -> firebase_admin.App:
+    """Return the default Firebase app, initializing it on first use."""
+    try:
+        return firebase_admin.get_app()
+    except ValueError:  # not initialized yet
+        pass
+
+    creds_json = os.environ.get("FIREBASE_CREDENTIALS")
+    if not creds_json:
+        raise RuntimeError("FIREBASE_CREDENTIALS environment variable not set")
+
+    bucket_name = os.environ.get("FIREBASE_BUCKET")
+    if not bucket_name:
+        raise RuntimeError("FIREBASE_BUCKET environment variable not set")
+
+    cred = credentials.Certificate(json.loads(creds_json))
+    return firebase_admin.initialize_app(cred, {"storageBucket": bucket_name})
+
+
+def init_firebase(http_pool_size: int = 10) -> storage.bucket:
+    """
+    Initialize Firebase and return the storage bucket.
+
+    The app is only initialized on the first call; later calls reuse it and its
+    storage client, whatever http_pool_size they pass.
+
+    Args:
+        http_pool_size: Pooled HTTPS connections to Cloud Storage; use at least
+            the number of threads that access the bucket concurrently
+    """
+    bucket = storage.bucket(app=_get_app())
+    # All blobs share the client's authorized session. Size its connection pool
+    # for the caller's threads, so every thread keeps its keep-alive connection
+    # instead of having it discarded when the pool is full.
+    adapter = HTTPAdapter(pool_connections=http_pool_size, pool_maxsize=http_pool_size)
+    bucket.client._http.mount("https://", adapter)
+    return bucket
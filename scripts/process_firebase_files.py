@@ -8,35 +8,81 @@ Expected Firebase Storage structure:
   Input:  recordings/$uid/$uid-yyyymmdd.csv
           recordings/$uid/$uid-yyyymmdd-location.csv
   Output: parsed/$uid/$type_tag/$yyyymmdd.csv (type_tag includes "location")
+          CSV/JSONL outputs are stored with Content-Encoding: gzip and are
+          decompressed transparently on download. Parquet outputs are
+          zstd-compressed internally and stored as-is.
+  Manifest: parsed/.manifest.json lists the input files already processed, so
+          later runs don't need to list every parsed output. Delete it to
+          fall back to checking the parsed outputs.
 
 Environment variables required:
   FIREBASE_CREDENTIALS: JSON string of Firebase service account credentials
   FIREBASE_BUCKET: Firebase Storage bucket name (e.g., "my-project.appspot.com")
 
 Optional environment variables:
-  OUTPUT_FORMAT: Output format - "csv" or "jsonl" (default: "csv")
+  OUTPUT_FORMAT: Output format - "csv", "jsonl" or "parquet" (default: "csv")
+  PARSE_BLOCK_SIZE: Bytes per block when reading input CSVs with Arrow (default: 16 MiB)
 """
 
 import csv
+import gzip
+import io
 import json
+import multiprocessing
 import os
 import sys
-import tempfile
-from collections import defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from pathlib import Path
 
-import firebase_admin
-from firebase_admin import credentials, storage
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core.exceptions import NotFound
 
 
 # Add parent directory to path so we can import parse_payload
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import parse_payload
-
-from datetime import datetime, timezone
-
-
-def expand_payload_records(records: list) -> list:
+from firebase_utils import MANIFEST_NAME, init_firebase
+
+
+# Threads for downloads/uploads (network-bound) and processes for parsing (CPU-bound)
+IO_WORKERS = 8
+# One parse process per CPU this process may run on, which can be fewer than
+# os.cpu_count() under a container's or runner's CPU affinity mask
+PARSE_WORKERS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+# Pooled HTTPS connections to Cloud Storage, shared by all I/O threads
+HTTP_POOL_SIZE = 2 * IO_WORKERS
+# Upper bound on files downloaded but not yet uploaded, to limit memory usage
+MAX_FILES_IN_FLIGHT = 2 * IO_WORKERS
+# Larger blocks amortize Arrow's per-block scheduling on short-row, payload-heavy inputs
+PARSE_BLOCK_SIZE = int(os.environ.get("PARSE_BLOCK_SIZE", str(16 * 1024 * 1024)))
+
+# Records per type_tag buffered before they are expanded and written out
+EXPAND_BATCH_SIZE = 4096
+# Columns of expanded rows (payload is a single value, not a list)
+EXPANDED_FIELDNAMES = ["timestamp_iso8601", "timestamp_epoch_ms", "packet", "payload"]
+CSV_HEADER = (",".join(EXPANDED_FIELDNAMES) + "\r\n").encode("ascii")
+# ISO8601 suffix for each millisecond of a second: ".000Z" ... ".999Z"
+ISO_MS_SUFFIXES = np.array([f".{ms:03d}Z" for ms in range(1000)])
+
+# File extension and content type of each OUTPUT_FORMAT
+OUTPUT_EXTENSIONS = {"csv": "csv", "jsonl": "jsonl", "parquet": "parquet"}
+OUTPUT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def expand_payload_records(records: list, next_ts_ms=None) -> list:
     """
     Expand records with multiple payload values into separate rows.
     Uses interpolation to estimate timestamps for each value.
@@ -44,101 +90,122 @@ def expand_payload_records(records: list) -> list:
     For example, if a record has payload ["0.223", "0.224", "0.224"] and the next
     record is 24ms later, each value gets a timestamp 8ms apart.
 
+    Interpolated timestamps and their ISO8601 strings are computed for all
+    records at once with NumPy rather than value by value.
+
     Args:
-        records: List of parsed records (must be sorted by timestamp)
+        records: List of parsed records as parse_payload.RECORD_FIELDS tuples
+            (must be sorted by timestamp)
+        next_ts_ms: timestamp_epoch_ms of the record following the last one, when
+            records is one batch of a longer stream (None if there is none)
 
     Returns:
-        List of expanded records, each with a single payload value
+        List of expanded rows, each a (timestamp_iso8601, timestamp_epoch_ms,
+        packet, payload) tuple in EXPANDED_FIELDNAMES order with a single payload value
     """
     if not records:
         return []
 
-    expanded = []
+    # Only timestamps and value counts enter the arithmetic (payload values stay
+    # strings), so it vectorizes in plain NumPy with no JIT compilation step.
+    counts = np.array([len(r[4]) for r in records], dtype=np.int64)
+    # Missing timestamps become NaN
+    ts_ms = np.array([r[1] for r in records], dtype=np.float64)
+
+    # Spread the gap to the next record evenly over this record's values.
+    # Default to 8ms per value (125 Hz) for the last record or if timestamps are missing.
+    next_ts_ms = np.append(ts_ms[1:], np.nan if next_ts_ms is None else next_ts_ms)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        intervals = (next_ts_ms - ts_ms) / counts
+    intervals[np.isnan(next_ts_ms) | np.isnan(ts_ms)] = 8.0
+
+    # Position of each value within its record: 0, 1, ..., count - 1
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    interpolated_ts_ms = np.repeat(ts_ms, counts) + offsets * np.repeat(intervals, counts)
+
+    # Convert to ISO8601 with millisecond precision ("...T12:34:56.789Z"). Only rows
+    # from multi-value records with a timestamp are formatted; the rest keep the
+    # record's own timestamp_iso8601.
+    # Rows are split into whole seconds and milliseconds with integer divmod.
+    # Consecutive rows mostly share a second, so only the distinct seconds go
+    # through datetime formatting and the millisecond suffix is a table lookup.
+    needs_iso = np.repeat((counts > 1) & ~np.isnan(ts_ms), counts)
+    seconds, ms = np.divmod(np.floor(interpolated_ts_ms[needs_iso]).astype(np.int64), 1000)
+    unique_seconds, second_index = np.unique(seconds, return_inverse=True)
+    second_prefixes = np.datetime_as_string(unique_seconds.astype("datetime64[s]"), unit="s")
+    interpolated_ts_iso = np.empty(len(interpolated_ts_ms), dtype=object)
+    interpolated_ts_iso[needs_iso] = np.char.add(second_prefixes[second_index], ISO_MS_SUFFIXES[ms])
+    interpolated_ts_iso = interpolated_ts_iso.tolist()
+    interpolated_ts_ms = interpolated_ts_ms.tolist()
 
-    for i, record in enumerate(records):
-        payload = record.get("payload", [])
-        if not payload:
+    expanded = []
+    start = 0
+    for record, num_values in zip(records, counts.tolist()):
+        if not num_values:
             continue
 
-        num_values = len(payload)
-        current_ts_ms = record.get("timestamp_epoch_ms")
-        current_ts_iso = record.get("timestamp_iso8601")
-        packet = record.get("packet")
+        current_ts_iso, current_ts_ms, packet, _, payload = record
 
         if num_values == 1:
             # Single value, no expansion needed
-            expanded.append({
-                "timestamp_iso8601": current_ts_iso,
-                "timestamp_epoch_ms": current_ts_ms,
-                "packet": packet,
-                "payload": payload[0],
-            })
-            continue
-
-        # Calculate interval between this record and the next
-        if i + 1 < len(records):
-            next_ts_ms = records[i + 1].get("timestamp_epoch_ms")
-            if current_ts_ms is not None and next_ts_ms is not None:
-                total_interval = next_ts_ms - current_ts_ms
-                interval_per_value = total_interval / num_values
-            else:
-                # Default to 8ms if timestamps are missing
-                interval_per_value = 8.0
+            expanded.append((current_ts_iso, current_ts_ms, packet, payload[0]))
+        elif current_ts_ms is None:
+            expanded.extend((current_ts_iso, None, packet, value) for value in payload)
         else:
-            # Last record - estimate based on typical sampling rate
-            # Default to 8ms per value (125 Hz)
-            interval_per_value = 8.0
-
-        # Expand each payload value into its own row
-        for j, value in enumerate(payload):
-            if current_ts_ms is not None:
-                interpolated_ts_ms = current_ts_ms + (j * interval_per_value)
-                # Convert to ISO8601
-                dt = datetime.fromtimestamp(interpolated_ts_ms / 1000.0, tz=timezone.utc)
-                interpolated_ts_iso = dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{int(interpolated_ts_ms % 1000):03d}Z"
-            else:
-                interpolated_ts_ms = None
-                interpolated_ts_iso = current_ts_iso
+            # Expand each payload value into its own row
+            expanded.extend(
+                (interpolated_ts_iso[j], interpolated_ts_ms[j], packet, value)
+                for j, value in enumerate(payload, start)
+            )
 
-            expanded.append({
-                "timestamp_iso8601": interpolated_ts_iso,
-                "timestamp_epoch_ms": interpolated_ts_ms,
-                "packet": packet,
-                "payload": value,
-            })
+        start += num_values
 
     return expanded
 
 
-def init_firebase() -> storage.bucket:
-    """Initialize Firebase and return the storage bucket."""
-    creds_json = os.environ.get("FIREBASE_CREDENTIALS")
-    if not creds_json:
-        raise RuntimeError("FIREBASE_CREDENTIALS environment variable not set")
+def load_manifest(bucket, output_prefix: str):
+    """
+    Load the names of input files recorded as processed by a previous run.
 
-    bucket_name = os.environ.get("FIREBASE_BUCKET")
-    if not bucket_name:
-        raise RuntimeError("FIREBASE_BUCKET environment variable not set")
+    Returns:
+        set of input blob names, or None if there is no manifest yet
+    """
+    try:
+        text = bucket.blob(f"{output_prefix}{MANIFEST_NAME}").download_as_text()
+    except NotFound:
+        return None
+    return set(json.loads(text)["processed"])
 
-    cred = credentials.Certificate(json.loads(creds_json))
-    firebase_admin.initialize_app(cred, {"storageBucket": bucket_name})
 
-    return storage.bucket()
+def save_manifest(bucket, output_prefix: str, processed: set) -> None:
+    """Record the names of all processed input files for the next run."""
+    manifest = json.dumps({"processed": sorted(processed)}, separators=(",", ":"))
+    bucket.blob(f"{output_prefix}{MANIFEST_NAME}").upload_from_string(
+        manifest, content_type="application/json"
+    )
 
 
-def get_unparsed_files(bucket, input_prefix: str, output_prefix: str) -> tuple:
+def get_unparsed_files(bucket, input_prefix: str, output_prefix: str, processed=None) -> tuple:
     """
-    List files in input_prefix that don't have a corresponding parsed file
-    in output_prefix.
+    List files in input_prefix that haven't been processed yet.
+
+    If processed (the manifest's input names) is given, it decides what is
+    done and the output listing is skipped; it holds one name per input file,
+    where output_prefix holds one per input file and type_tag. Otherwise a
+    file counts as done if it has a corresponding parsed file in output_prefix.
 
     Input structure:  recordings/$uid/$uid-yyyymmdd.csv
                       recordings/$uid/$uid-yyyymmdd-location.csv
     Output structure: parsed/$uid/$type_tag/$yyyymmdd.csv (location is a type_tag)
 
     Returns:
-        tuple: (data_files, location_files) - lists of blobs to process
+        tuple: (data_files, location_files, done) - lists of blobs to process,
+        and the set of input blob names that are already processed
     """
-    input_blobs = list(bucket.list_blobs(prefix=input_prefix))
+    if processed is not None:
+        return _list_unprocessed_inputs(
+            bucket, input_prefix, lambda blob, base_path: blob.name in processed
+        )
 
     # Build set of already-parsed files
     # e.g., "parsed/abc123/HR/20241201.csv" means abc123-20241201 HR data is parsed
@@ -146,23 +213,47 @@ def get_unparsed_files(bucket, input_prefix: str, output_prefix: str) -> tuple:
     parsed_data = set()
     parsed_location = set()
 
-    for blob in bucket.list_blobs(prefix=output_prefix):
-        parts = blob.name[len(output_prefix):].split("/")
+    # Only names are needed, so request a partial response without the rest of
+    # each blob's metadata; this is most of the listing payload.
+    for blob in bucket.list_blobs(prefix=output_prefix, fields="items(name),nextPageToken"):
+        parts = blob.name.removeprefix(output_prefix).split("/", 3)
         if len(parts) >= 3:
             uid = parts[0]
             tag_folder = parts[1]
             filename = parts[2]
             # Filename is now just yyyymmdd.csv
-            date_part = filename.split(".")[0]
+            date_part = filename.partition(".")[0]
             if tag_folder == "location":
                 parsed_location.add(f"{uid}/{uid}-{date_part}-location")
             else:
                 parsed_data.add(f"{uid}/{uid}-{date_part}")
 
+    def is_parsed(blob, base_path):
+        if base_path.endswith("-location"):
+            return base_path in parsed_location
+        return base_path in parsed_data
+
+    return _list_unprocessed_inputs(bucket, input_prefix, is_parsed)
+
+
+def _list_unprocessed_inputs(bucket, input_prefix: str, is_done) -> tuple:
+    """
+    List the CSV files in input_prefix, split into data and location files.
+
+    Args:
+        is_done: callable(blob, base_path) -> bool, where base_path is the
+            blob's name relative to input_prefix without the .csv extension
+
+    Returns:
+        tuple: (data_files, location_files, done)
+    """
     data_files = []
     location_files = []
+    done = set()
 
-    for blob in input_blobs:
+    # Stream the input listing; it is only needed once. Processing only uses
+    # each blob's name, so the rest of its metadata isn't requested.
+    for blob in bucket.list_blobs(prefix=input_prefix, fields="items(name),nextPageToken"):
         # Skip "directories" (empty blobs ending with /)
         if blob.name.endswith("/"):
             continue
@@ -171,40 +262,35 @@ def get_unparsed_files(bucket, input_prefix: str, output_prefix: str) -> tuple:
             continue
 
         # Get path relative to input prefix: $uid/$uid-yyyymmdd.csv or $uid/$uid-yyyymmdd-location.csv
-        relative_path = blob.name[len(input_prefix):]
+        relative_path = blob.name.removeprefix(input_prefix)
         # Remove .csv extension
-        base_path = relative_path.rsplit(".", 1)[0]
+        base_path = relative_path[:-len(".csv")]
 
-        if base_path.endswith("-location"):
+        if is_done(blob, base_path):
+            done.add(blob.name)
+        elif base_path.endswith("-location"):
             # Location file
-            if base_path not in parsed_location:
-                location_files.append(blob)
+            location_files.append(blob)
         else:
             # Data file
-            if base_path not in parsed_data:
-                data_files.append(blob)
+            data_files.append(blob)
 
-    return data_files, location_files
+    return data_files, location_files, done
 
 
-def move_location_file(
-    blob, bucket, input_prefix: str, output_prefix: str, temp_dir: Path
-) -> bool:
+def move_location_file(blob, bucket, input_prefix: str, output_prefix: str) -> bool:
     """
     Move a location file without parsing.
     Returns True if successful, False otherwise.
 
+    The copy happens server-side, so the file's contents never pass through
+    this machine.
+
     Output structure:
       recordings/$uid/$uid-yyyymmdd-location.csv -> parsed/$uid/location/$yyyymmdd.csv
     """
-    temp_path = temp_dir / "location.csv"
-
     print(f"Moving location file: {blob.name}")
 
-    # Download the file
-    print(f"  Downloading...")
-    blob.download_to_filename(str(temp_path))
-
     # Extract uid and date from blob name
     # e.g., recordings/abc123/abc123-20241201-location.csv -> uid=abc123, date=20241201
     relative_path = blob.name[len(input_prefix):]  # $uid/$uid-yyyymmdd-location.csv
@@ -215,34 +301,222 @@ def move_location_file(
     base_name = filename.rsplit("-location", 1)[0]  # $uid-yyyymmdd
     date_part = base_name.rsplit("-", 1)[-1]  # yyyymmdd
 
-    # Upload: parsed/$uid/location/$yyyymmdd.csv
+    # Copy to: parsed/$uid/location/$yyyymmdd.csv
     output_blob_name = f"{output_prefix}{uid}/location/{date_part}.csv"
-    print(f"  Uploading to: {output_blob_name}")
-    output_blob = bucket.blob(output_blob_name)
-    output_blob.upload_from_filename(str(temp_path), content_type="text/csv")
+    bucket.copy_blob(blob, bucket, output_blob_name)
 
-    print(f"  Done!")
+    print(f"  Moved to: {output_blob_name}")
     return True
 
 
-def process_file(
-    blob, bucket, input_prefix: str, output_prefix: str, output_format: str, temp_dir: Path
-) -> bool:
+def move_location_files(location_files: list, bucket, input_prefix: str, output_prefix: str) -> tuple:
     """
-    Download a file, parse it, and upload separate files per type_tag.
-    Returns True if successful, False otherwise.
+    Move location files concurrently.
 
-    Output structure:
-      recordings/$uid/$uid-yyyymmdd.csv -> parsed/$uid/$type_tag/$yyyymmdd.csv
+    Returns:
+        tuple: (moved, error_count) - names of the moved input blobs, and the
+        number of files that failed
     """
-    input_path = temp_dir / "input.csv"
-    extension = "csv" if output_format == "csv" else "jsonl"
+    moved_files = []
+    error_count = 0
+
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as io_pool:
+        futures = {
+            io_pool.submit(move_location_file, blob, bucket, input_prefix, output_prefix): blob
+            for blob in location_files
+        }
+        for future in as_completed(futures):
+            try:
+                moved = future.result()
+            except Exception as e:
+                print(f"ERROR moving {futures[future].name}: {e}")
+                moved = False
+            if moved:
+                moved_files.append(futures[future].name)
+            else:
+                error_count += 1
+
+    return moved_files, error_count
+
 
-    print(f"Processing: {blob.name}")
+def download_input(blob) -> bytes:
+    """Download a data file into memory."""
+    print(f"Downloading: {blob.name}")
+    return blob.download_as_bytes()
 
-    # Download the file
-    print(f"  Downloading...")
-    blob.download_to_filename(str(input_path))
+
+def _csv_lines(rows: list) -> bytes:
+    """
+    Render expanded rows as CSV, byte for byte as csv.writer would.
+
+    Rows have a fixed four-field shape whose fields practically never need
+    quoting, so they are formatted with one f-string each, which is about twice
+    as fast as csv.writer. If any field does contain a delimiter, quote or line
+    break, the batch is rendered with csv.writer instead.
+    """
+    text = "".join([
+        f"{'' if ts_iso is None else ts_iso},{'' if ts_ms is None else ts_ms},"
+        f"{'' if packet is None else packet},{value}\r\n"
+        for ts_iso, ts_ms, packet, value in rows
+    ])
+    # Unquoted rows hold exactly three commas and one line terminator each
+    num_rows = len(rows)
+    if (
+        '"' in text
+        or text.count(",") != 3 * num_rows
+        or text.count("\n") != num_rows
+        or text.count("\r") != num_rows
+    ):
+        fallback = io.StringIO(newline="")
+        csv.writer(fallback).writerows(rows)
+        text = fallback.getvalue()
+    return text.encode("utf-8")
+
+
+def _write_expanded(output: dict, output_format: str, records: list, next_ts_ms) -> None:
+    """Expand a batch of one type_tag's records and append the rows to its output."""
+    expanded_records = expand_payload_records(records, next_ts_ms)
+    if output_format == "jsonl":
+        output["gzip"].write(b"".join([
+            orjson.dumps(dict(zip(EXPANDED_FIELDNAMES, row)), option=orjson.OPT_APPEND_NEWLINE)
+            for row in expanded_records
+        ]))
+    elif output_format == "parquet":
+        columns = list(zip(*expanded_records)) or [()] * len(EXPANDED_FIELDNAMES)
+        output["tables"].append(pa.table({
+            "timestamp_iso8601": pa.array(columns[0], pa.string()),
+            "timestamp_epoch_ms": pa.array(columns[1], pa.float64()),
+            "packet": _packet_array(columns[2]),
+            "payload": pa.array(columns[3], pa.string()),
+        }))
+    else:
+        output["gzip"].write(_csv_lines(expanded_records))
+    output["rows"] += len(expanded_records)
+
+
+def _packet_array(packets) -> pa.Array:
+    """
+    Packets as int64, or as strings if any isn't an integer (the parser passes
+    non-numeric packets through as text). pa.array() would silently truncate
+    floats to int64, so the value types are checked first.
+    """
+    if set(map(type, packets)) <= {int, type(None)}:
+        return pa.array(packets, pa.int64())
+    return pa.array([None if p is None else str(p) for p in packets], pa.string())
+
+
+def _finish_parquet(tables: list) -> bytes:
+    """
+    Combine one type_tag's expanded batches into a single Parquet file.
+
+    Payload is stored as float64 when every value is numeric, and kept as
+    strings otherwise (some type_tags carry text payloads). Packet is int64
+    unless some batch had to store it as strings.
+    """
+    if any(t.schema.field("packet").type == pa.string() for t in tables):
+        tables = [
+            t.set_column(
+                t.schema.get_field_index("packet"), "packet", t.column("packet").cast(pa.string())
+            )
+            for t in tables
+        ]
+    table = pa.concat_tables(tables)
+    try:
+        payload = table.column("payload").cast(pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        pass
+    else:
+        table = table.set_column(table.schema.get_field_index("payload"), "payload", payload)
+
+    sink = io.BytesIO()
+    # Packets repeat across the rows of an expanded record, so they
+    # dictionary-encode well. Timestamps are fractional (interpolated) floats, for
+    # which byte-stream-split is the closest thing to delta encoding.
+    pq.write_table(
+        table,
+        sink,
+        compression="zstd",
+        compression_level=1,
+        use_dictionary=["packet"],
+        column_encoding={"timestamp_epoch_ms": "BYTE_STREAM_SPLIT"},
+    )
+    return sink.getvalue()
+
+
+def parse_input(data: bytes, output_format: str) -> dict:
+    """
+    Parse a downloaded file and serialize a separate output per type_tag.
+    Runs in a worker process, so it only takes and returns picklable values.
+
+    Records are streamed from the parser into per-type_tag outputs in batches of
+    EXPAND_BATCH_SIZE rather than collected for the whole file first. Each tag
+    holds back its newest record, whose timestamp is needed to interpolate the
+    one before it. Parsing, expansion and serialization therefore happen in a
+    single pass: apart from the serialized outputs, only one batch of records
+    and its expanded rows are held per tag. Batches, rather than single
+    records, keep the interpolation vectorized.
+
+    Returns:
+        dict mapping type_tag -> (output bytes, expanded row count, record count).
+        CSV/JSONL output is gzipped; Parquet is compressed internally.
+    """
+    outputs = {}  # type_tag -> {"buffer", "gzip", "tables", "pending", "rows", "records"}
+
+    # PARSE_WORKERS processes already occupy every core, so Arrow's own thread
+    # pool would only oversubscribe them
+    records = parse_payload.parse_bytes_tuples(data, block_size=PARSE_BLOCK_SIZE, use_threads=False)
+    for record in records:
+        type_tag = record[3]
+        output = outputs.get(type_tag)
+        if output is None:
+            output = outputs[type_tag] = {
+                "buffer": None, "gzip": None, "tables": [], "pending": [], "rows": 0, "records": 0,
+            }
+            if output_format != "parquet":
+                # CSV and JSONL rows are compressed as they are written, so only the
+                # compressed output is held in memory. Level 1 gets most of the ratio
+                # on repetitive timestamp/packet text for little CPU.
+                output["buffer"] = io.BytesIO()
+                output["gzip"] = gzip.GzipFile(fileobj=output["buffer"], mode="wb", compresslevel=1)
+                if output_format == "csv":
+                    output["gzip"].write(CSV_HEADER)
+
+        pending = output["pending"]
+        pending.append(record)
+        output["records"] += 1
+        if len(pending) > EXPAND_BATCH_SIZE:
+            # Expand everything except the newest record, which supplies the next timestamp
+            _write_expanded(output, output_format, pending[:-1], record[1])
+            del pending[:-1]
+
+    # Flush what's left; the final record of each tag has no next timestamp
+    for output in outputs.values():
+        _write_expanded(output, output_format, output["pending"], None)
+
+    # Outputs are compressed here in the worker so upload threads only move bytes
+    results = {}
+    for type_tag, output in outputs.items():
+        if output_format == "parquet":
+            data = _finish_parquet(output["tables"])
+        else:
+            output["gzip"].close()
+            data = output["buffer"].getvalue()
+        results[type_tag] = (data, output["rows"], output["records"])
+    return results
+
+
+def upload_outputs(
+    blob, bucket, input_prefix: str, output_prefix: str, output_format: str, outputs: dict
+) -> int:
+    """
+    Upload the per-type_tag outputs produced by parse_input.
+    Returns the number of files uploaded.
+
+    Output structure:
+      recordings/$uid/$uid-yyyymmdd.csv -> parsed/$uid/$type_tag/$yyyymmdd.csv
+    """
+    extension = OUTPUT_EXTENSIONS[output_format]
+    content_type = OUTPUT_CONTENT_TYPES[output_format]
 
     # Extract uid and date from blob name
     # e.g., recordings/abc123/abc123-20241201.csv -> uid=abc123, date=20241201
@@ -252,53 +526,102 @@ def process_file(
     filename = path_parts[-1]  # $uid-yyyymmdd.csv
     date_part = filename.rsplit("-", 1)[-1].split(".")[0]  # yyyymmdd
 
-    # Parse the file and group records by type_tag
-    print(f"  Parsing and grouping by type_tag...")
-    try:
-        records_by_tag = defaultdict(list)
-        for record in parse_payload.parse_file(input_path):
-            type_tag = record.get("type_tag", "UNKNOWN")
-            records_by_tag[type_tag].append(record)
-    except Exception as e:
-        print(f"  ERROR parsing: {e}")
-        return False
-
-    if not records_by_tag:
-        print(f"  No records found")
-        return True
-
-    # Upload a separate file for each type_tag
-    content_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
     upload_count = 0
-
-    # Fieldnames for expanded records (payload is now a single value, not a list)
-    expanded_fieldnames = ["timestamp_iso8601", "timestamp_epoch_ms", "packet", "payload"]
-
-    for type_tag, records in records_by_tag.items():
-        output_path = temp_dir / f"output_{type_tag}.{extension}"
-
-        # Expand payload records (split multi-value payloads into separate rows)
-        expanded_records = expand_payload_records(records)
-
-        # Write records for this type_tag
-        with output_path.open("w", encoding="utf-8", newline="" if output_format == "csv" else None) as f:
-            if output_format == "jsonl":
-                for record in expanded_records:
-                    f.write(json.dumps(record, ensure_ascii=True) + "\n")
-            else:
-                writer = csv.DictWriter(f, fieldnames=expanded_fieldnames)
-                writer.writeheader()
-                writer.writerows(expanded_records)
-
+    for type_tag, (output_data, row_count, record_count) in outputs.items():
         # Upload: parsed/$uid/$type_tag/$yyyymmdd.csv
         output_blob_name = f"{output_prefix}{uid}/{type_tag}/{date_part}.{extension}"
-        print(f"  Uploading: {output_blob_name} ({len(expanded_records)} rows from {len(records)} records)")
+        print(f"  Uploading: {output_blob_name} ({row_count} rows from {record_count} records)")
         output_blob = bucket.blob(output_blob_name)
-        output_blob.upload_from_filename(str(output_path), content_type=content_type)
+        if output_format != "parquet":
+            # Stored gzipped; GCS decompresses transparently for readers (decompressive
+            # transcoding), so the blob keeps its plain .csv/.jsonl name and type.
+            output_blob.content_encoding = "gzip"
+        # Leave chunk_size unset: outputs up to 8 MiB already go up in a single
+        # multipart request, and larger ones use the client's 100 MiB resumable
+        # chunks. A smaller explicit chunk_size would only add round trips.
+        output_blob.upload_from_string(output_data, content_type=content_type)
         upload_count += 1
 
-    print(f"  Done! Uploaded {upload_count} files for {len(records_by_tag)} type tags")
-    return True
+    return upload_count
+
+
+def process_data_files(
+    data_files: list, bucket, input_prefix: str, output_prefix: str, output_format: str
+) -> tuple:
+    """
+    Download, parse, and upload data files as an overlapping pipeline.
+
+    Downloads and uploads run on a thread pool while parsing runs on a process
+    pool, so network transfers for some files overlap with parsing of others.
+    Files are kept in memory end to end; at most MAX_FILES_IN_FLIGHT are held
+    at a time.
+
+    Returns:
+        tuple: (processed, error_count) - names of the input blobs processed
+        successfully, and the number of files that failed
+    """
+    processed = []
+    error_count = 0
+    pending = {}  # future -> (stage, blob)
+    queued = iter(data_files)
+
+    def start_downloads():
+        while len(pending) < MAX_FILES_IN_FLIGHT:
+            blob = next(queued, None)
+            if blob is None:
+                return
+            pending[io_pool.submit(download_input, blob)] = ("downloading", blob)
+
+    # Parse workers are started while download threads are mid-request. Forking a
+    # multi-threaded process can deadlock the child, so start them from a
+    # single-threaded fork server where the platform has one.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("forkserver")
+    else:
+        mp_context = None
+
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as io_pool, \
+            ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=mp_context) as parse_pool:
+        start_downloads()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, blob = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"ERROR {stage} {blob.name}: {e}")
+                    error_count += 1
+                    continue
+
+                if stage == "downloading" or (stage == "parsing" and result):
+                    # submit() itself raises once a pool is broken, e.g. after a parse
+                    # worker was killed, so the file still counts as failed.
+                    next_stage = "parsing" if stage == "downloading" else "uploading"
+                    try:
+                        if next_stage == "parsing":
+                            print(f"Parsing and grouping by type_tag: {blob.name}")
+                            next_future = parse_pool.submit(parse_input, result, output_format)
+                        else:
+                            next_future = io_pool.submit(
+                                upload_outputs,
+                                blob, bucket, input_prefix, output_prefix, output_format, result,
+                            )
+                    except Exception as e:
+                        print(f"ERROR {next_stage} {blob.name}: {e}")
+                        error_count += 1
+                        continue
+                    pending[next_future] = (next_stage, blob)
+                else:
+                    if stage == "parsing":
+                        print(f"No records found: {blob.name}")
+                    else:
+                        print(f"Done! Uploaded {result} files for {blob.name}")
+                    processed.append(blob.name)
+
+            start_downloads()
+
+    return processed, error_count
 
 
 def main() -> int:
@@ -306,41 +629,45 @@ def main() -> int:
     output_prefix = "parsed/"
     output_format = os.environ.get("OUTPUT_FORMAT", "csv")
 
-    if output_format not in ("csv", "jsonl"):
-        print(f"Invalid OUTPUT_FORMAT: {output_format}. Must be 'csv' or 'jsonl'.")
+    if output_format not in OUTPUT_EXTENSIONS:
+        print(f"Invalid OUTPUT_FORMAT: {output_format}. Must be 'csv', 'jsonl' or 'parquet'.")
         return 1
 
     print("Initializing Firebase...")
-    bucket = init_firebase()
+    bucket = init_firebase(HTTP_POOL_SIZE)
+
+    # Delete parsed/.manifest.json to force a full rescan of the parsed outputs
+    processed = load_manifest(bucket, output_prefix)
+    if processed is None:
+        print("No manifest found; checking existing parsed outputs.")
 
     print(f"Looking for unparsed files in '{input_prefix}'...")
-    data_files, location_files = get_unparsed_files(bucket, input_prefix, output_prefix)
+    data_files, location_files, done = get_unparsed_files(
+        bucket, input_prefix, output_prefix, processed
+    )
 
     if not data_files and not location_files:
         print("No unparsed files found.")
+        if processed is None:
+            save_manifest(bucket, output_prefix, done)
         return 0
 
     print(f"Found {len(data_files)} data file(s) and {len(location_files)} location file(s).")
 
-    success_count = 0
-    error_count = 0
-
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
+    # Process data files (parse and split by type_tag)
+    parsed_files, error_count = process_data_files(
+        data_files, bucket, input_prefix, output_prefix, output_format
+    )
 
-        # Process data files (parse and split by type_tag)
-        for blob in data_files:
-            if process_file(blob, bucket, input_prefix, output_prefix, output_format, temp_path):
-                success_count += 1
-            else:
-                error_count += 1
+    # Move location files (no parsing)
+    moved_files, move_error_count = move_location_files(
+        location_files, bucket, input_prefix, output_prefix
+    )
+    success_count = len(parsed_files) + len(moved_files)
+    error_count += move_error_count
 
-        # Move location files (no parsing)
-        for blob in location_files:
-            if move_location_file(blob, bucket, input_prefix, output_prefix, temp_path):
-                success_count += 1
-            else:
-                error_count += 1
+    # Failed files are left out, so the next run retries them
+    save_manifest(bucket, output_prefix, done.union(parsed_files, moved_files))
 
     print(f"\nSummary: {success_count} succeeded, {error_count} failed")
     return 1 if error_count > 0 else 0